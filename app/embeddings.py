@@ -11,14 +11,25 @@ embedding implementation if you prefer (then you'll need an API key).
 """
 
 from typing import List, Tuple
+from functools import lru_cache
+import hashlib
 import os
-import json
 import numpy as np
+import orjson
+
+from app.utils import SimpleLRUCache
+
+# Optional persistent tier for embed_cached (survives restarts / repeated script runs)
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
 
 # LangChain text splitter (helps with robust chunking)
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 # SentenceTransformers embedding model
+import torch
 from sentence_transformers import SentenceTransformer
 
 # Path to save outputs (chunks + embeddings)
@@ -27,16 +38,63 @@ DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "embe
 # Initialize embedding model once (small + fast for dev)
 # "all-MiniLM-L6-v2" is a good default for many semantic-search tasks.
 EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
-_embedding_model = None
-
-
+# Batch size for model.encode calls. sentence-transformers sorts inputs by length before
+# batching, so larger batches mostly cost padding only within similar-length groups.
+ENCODE_BATCH_SIZE = 64
+# Inputs longer than this (in tokens) are truncated; avoids wasted compute on padding.
+EMBEDDING_MAX_SEQ_LENGTH = 256
+
+
+def _select_device() -> str:
+    """Pick the best available device (override with EMBEDDING_DEVICE=cpu|cuda|mps)."""
+    override = os.getenv("EMBEDDING_DEVICE")
+    if override:
+        return override
+    if torch.cuda.is_available():
+        return "cuda"
+    mps = getattr(torch.backends, "mps", None)
+    if mps is not None and mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+@lru_cache(maxsize=1)
 def get_embedding_model():
     """Load (or return cached) embedding model."""
-    global _embedding_model
-    if _embedding_model is None:
-        print(f"[embeddings] Loading SentenceTransformer model: {EMBEDDING_MODEL_NAME} (this may take a few seconds)...")
-        _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
-    return _embedding_model
+    device = _select_device()
+    print(f"[embeddings] Loading SentenceTransformer model: {EMBEDDING_MODEL_NAME} on {device} (this may take a few seconds)...")
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME, device=device)
+    # Half precision on accelerators halves memory traffic; CPU fp16 matmul is slower, so keep fp32 there.
+    if device != "cpu":
+        model.half()
+    model.max_seq_length = EMBEDDING_MAX_SEQ_LENGTH
+    model.eval()
+    return model
+
+
+def encode(texts: List[str], **kwargs) -> np.ndarray:
+    """
+    model.encode under torch.inference_mode(), which skips autograd bookkeeping entirely.
+    All embedding calls in the app go through here.
+    """
+    model = get_embedding_model()
+    with torch.inference_mode():
+        return model.encode(texts, **kwargs)
+
+
+def warmup():
+    """Load the model and run one dummy encode, so the first real query is not slow."""
+    encode(["warmup"])
+
+
+@lru_cache(maxsize=8)
+def _get_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    """Build (or return cached) text splitter for the given chunking parameters."""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len
+    )
 
 
 def chunk_document(text: str, chunk_size: int = 500, chunk_overlap: int = 50) -> List[str]:
@@ -51,13 +109,76 @@ def chunk_document(text: str, chunk_size: int = 500, chunk_overlap: int = 50) ->
     Returns:
         List of chunk strings
     """
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        length_function=len
-    )
-    chunks = splitter.split_text(text)
-    return chunks
+    return _get_splitter(chunk_size, chunk_overlap).split_text(text)
+
+
+# Number of distinct text embeddings kept in memory by embed_cached.
+EMBED_CACHE_SIZE = 10000
+# On-disk cache directory for embed_cached (used when diskcache is installed). Off ("") by
+# default: in the API every miss would be a synchronous SQLite write inside the request.
+# Scripts opt in with enable_disk_cache().
+DEFAULT_EMBED_CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "data", ".embcache")
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", "")
+
+_emb_cache = SimpleLRUCache(capacity=EMBED_CACHE_SIZE)
+_emb_disk_cache = None
+
+
+def enable_disk_cache(path: str = ""):
+    """
+    Persist embed_cached results on disk (for scripts run repeatedly over the same texts).
+    Uses `path`, else $EMBED_CACHE_DIR, else data/.embcache.
+    """
+    global EMBED_CACHE_DIR, _emb_disk_cache
+    path = path or os.getenv("EMBED_CACHE_DIR") or DEFAULT_EMBED_CACHE_DIR
+    if path != EMBED_CACHE_DIR:
+        EMBED_CACHE_DIR = path
+        _emb_disk_cache = None
+
+
+def _get_disk_cache():
+    """Open (or return cached) on-disk embedding cache, or None if unavailable/disabled."""
+    global _emb_disk_cache
+    if _emb_disk_cache is None and diskcache is not None and EMBED_CACHE_DIR:
+        _emb_disk_cache = diskcache.Cache(EMBED_CACHE_DIR)
+    return _emb_disk_cache
+
+
+def embed_cached(text: str) -> np.ndarray:
+    """
+    Embed one text as a unit-norm float32 vector (read-only), memoized by content hash.
+
+    Looks in an in-memory LRU first, then the on-disk cache (if enabled), and only runs the
+    model on a miss. The model name is part of the hash, so switching models never returns
+    stale vectors.
+    """
+    key = hashlib.blake2b(f"{EMBEDDING_MODEL_NAME}\0{text}".encode("utf-8"), digest_size=16).hexdigest()
+    vec = _emb_cache.get(key)
+    if vec is not None:
+        return vec
+
+    disk = _get_disk_cache()
+    if disk is not None:
+        vec = disk.get(key)
+    if vec is None:
+        vec = encode([text], convert_to_numpy=True, normalize_embeddings=True)[0]
+        vec = vec.astype(np.float32, copy=False)
+        if disk is not None:
+            disk.set(key, vec)
+
+    vec.setflags(write=False)  # shared between callers via the cache
+    _emb_cache.set(key, vec)
+    return vec
+
+
+def embed_query(query: str) -> np.ndarray:
+    """
+    Embed a search query as a unit-norm float32 vector (read-only).
+
+    Goes through embed_cached on the stripped, lowercased question, so repeated questions skip
+    the model forward pass. The model is uncased, so lowercasing does not change the vector.
+    """
+    return embed_cached(query.strip().lower())
 
 
 def embed_chunks(chunks: List[str]) -> np.ndarray:
@@ -65,22 +186,43 @@ def embed_chunks(chunks: List[str]) -> np.ndarray:
     Convert a list of text chunks into vector embeddings (numpy array).
 
     Returns:
-        2D numpy array with shape (num_chunks, embedding_dim)
+        2D numpy array with shape (num_chunks, embedding_dim), rows L2-normalized
     """
-    model = get_embedding_model()
-    embeddings = model.encode(chunks, show_progress_bar=True)  # returns list of vectors
-    return np.array(embeddings)
+    return encode(
+        chunks,
+        batch_size=ENCODE_BATCH_SIZE,
+        show_progress_bar=len(chunks) > ENCODE_BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+    )
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric per-vector int8 quantization.
+
+    Returns (vectors_i8, scales) with vectors ~= vectors_i8 * scales[:, None].
+    Accepts a single vector too (then scales has shape (1,)).
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    vectors_i8 = np.clip(np.round(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return vectors_i8, scales.astype(np.float32)
 
 
 def save_embeddings(chunks: List[str], embeddings: np.ndarray, output_dir: str = DEFAULT_OUTPUT_DIR):
     """
     Save chunks and embeddings to disk:
     - chunks.json => list of chunks and metadata
-    - vectors.npy => numpy array of embeddings
+    - vectors.npy => numpy array of L2-normalized embeddings (stored as float16)
+    - vectors_i8.npy + scales.npy => the same vectors quantized to int8 (see quantize_int8)
 
     Files:
       <output_dir>/chunks.json
       <output_dir>/vectors.npy
+      <output_dir>/vectors_i8.npy
+      <output_dir>/scales.npy
     """
     os.makedirs(output_dir, exist_ok=True)
 
@@ -89,11 +231,21 @@ def save_embeddings(chunks: List[str], embeddings: np.ndarray, output_dir: str =
 
     # Save chunks + minimal metadata (index + text)
     serialized = [{"id": i, "text": chunks[i]} for i in range(len(chunks))]
-    with open(chunks_path, "w", encoding="utf-8") as f:
-        json.dump(serialized, f, ensure_ascii=False, indent=2)
+    with open(chunks_path, "wb") as f:
+        f.write(orjson.dumps(serialized))
+
+    # L2-normalize rows so search can score with a plain dot product.
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    embeddings = embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12)
+
+    # Save embedding vectors as numpy binary. float16 halves disk size and the bytes
+    # scanned per query; search is memory-bound so the precision loss does not matter.
+    np.save(vectors_path, embeddings.astype(np.float16))
 
-    # Save embedding vectors as numpy binary
-    np.save(vectors_path, embeddings)
+    # int8 copy for brute-force scans with SimSIMD's int8 kernels (debug_similarity).
+    vectors_i8, scales = quantize_int8(embeddings)
+    np.save(os.path.join(output_dir, "vectors_i8.npy"), vectors_i8)
+    np.save(os.path.join(output_dir, "scales.npy"), scales)
 
     print(f"[embeddings] Saved {len(chunks)} chunks to {chunks_path}")
     print(f"[embeddings] Saved embeddings (shape: {embeddings.shape}) to {vectors_path}")
@@ -106,6 +258,7 @@ def load_embeddings(output_dir: str = DEFAULT_OUTPUT_DIR) -> Tuple[List[dict], n
     Returns:
         (chunks_list, embeddings_array)
         where chunks_list is a list of dicts: {"id": int, "text": str}
+        and embeddings_array is a read-only memory map (upcast to float32 before heavy math).
     """
     chunks_path = os.path.join(output_dir, "chunks.json")
     vectors_path = os.path.join(output_dir, "vectors.npy")
@@ -113,14 +266,36 @@ def load_embeddings(output_dir: str = DEFAULT_OUTPUT_DIR) -> Tuple[List[dict], n
     if not os.path.exists(chunks_path) or not os.path.exists(vectors_path):
         raise FileNotFoundError("Saved embeddings not found. Run save_embeddings first.")
 
-    with open(chunks_path, "r", encoding="utf-8") as f:
-        chunks = json.load(f)
+    with open(chunks_path, "rb") as f:
+        chunks = orjson.loads(f.read())
 
-    embeddings = np.load(vectors_path)
+    embeddings = np.load(vectors_path, mmap_mode="r")
     print(f"[embeddings] Loaded {len(chunks)} chunks and embeddings with shape {embeddings.shape}")
     return chunks, embeddings
 
 
+def load_int8_embeddings(output_dir: str = DEFAULT_OUTPUT_DIR) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Load the int8 vectors and per-vector scales written by save_embeddings.
+    Older output dirs only have vectors.npy; those are quantized on the fly.
+    """
+    i8_path = os.path.join(output_dir, "vectors_i8.npy")
+    scales_path = os.path.join(output_dir, "scales.npy")
+    if os.path.exists(i8_path) and os.path.exists(scales_path):
+        return np.load(i8_path, mmap_mode="r"), np.load(scales_path)
+
+    vectors_path = os.path.join(output_dir, "vectors.npy")
+    if not os.path.exists(vectors_path):
+        raise FileNotFoundError("Saved embeddings not found. Run save_embeddings first.")
+    print("[embeddings] vectors_i8.npy not found, quantizing vectors.npy in memory")
+    return quantize_int8(np.load(vectors_path))
+
+
+# Optionally pay model-load cost at import time (e.g. for scripts); the API warms up on startup.
+if os.getenv("EMBEDDING_WARMUP_ON_IMPORT") == "1":
+    warmup()
+
+
 if __name__ == "__main__":
     # Quick local demo when running the file directly
     demo_path = os.path.join(os.path.dirname(__file__), "..", "data", "sample.txt")
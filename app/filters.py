@@ -20,24 +20,27 @@ REDACT_TOKEN = "[REDACTED]"
 def redact_text(text: str) -> Tuple[str, bool]:
     """
     Redact any matched sensitive patterns. Returns (redacted_text, had_redaction_bool).
+    Patterns run one after another over the previous output (not as one alternation), so
+    e.g. digits right after an email are still seen by the phone pattern. One subn per
+    pattern does the search and the substitution in a single scan.
     """
     had = False
     out = text
-    for name, pattern in _PATTERNS.items():
-        if pattern.search(out):
-            had = True
-            out = pattern.sub(REDACT_TOKEN, out)
+    for pattern in _PATTERNS.values():
+        out, n = pattern.subn(REDACT_TOKEN, out)
+        had = had or n > 0
     return out, had
 
+# Example: if text mentions "password" or "ssn" etc, treat as disallowed
+DISALLOWED_KEYWORDS = ["password", "ssn", "social security", "credit card cvv"]
+
+# One case-insensitive matcher for all keywords: a single scan regardless of keyword count,
+# and no lowered copy of the text.
+_DISALLOWED_RE = re.compile("|".join(map(re.escape, DISALLOWED_KEYWORDS)), re.IGNORECASE)
+
 def is_disallowed(text: str) -> bool:
     """
     A quick check whether text contains disallowed content we should not return.
     Extend with more advanced checks as required.
     """
-    # Example: if text mentions "password" or "ssn" etc, treat as disallowed
-    lowered = text.lower()
-    disallowed_keywords = ["password", "ssn", "social security", "credit card cvv"]
-    for kw in disallowed_keywords:
-        if kw in lowered:
-            return True
-    return False
+    return _DISALLOWED_RE.search(text) is not None
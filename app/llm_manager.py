@@ -3,20 +3,24 @@ import os
 from typing import List
 from dotenv import load_dotenv
 
-# New OpenAI client
-from openai import OpenAI
+# New OpenAI client (sync for scripts, async for the FastAPI handlers)
+from openai import OpenAI, AsyncOpenAI
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise RuntimeError("OPENAI_API_KEY not found in environment. Add it to .env")
 
-# Create client instance
+# Create client instances
 client = OpenAI(api_key=OPENAI_API_KEY)
+aclient = AsyncOpenAI(api_key=OPENAI_API_KEY)
 
 # Model / settings
 LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
 TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.2"))
+# Hard cap on context characters sent to the LLM (bounds prompt tokens, cost and latency)
+MAX_CONTEXT_CHARS = int(os.getenv("LLM_MAX_CONTEXT_CHARS", "6000"))
+CONTEXT_SEPARATOR = "\n\n---\n\n"
 
 PROMPT_SYSTEM = (
     "You are an assistant that answers using ONLY the provided context. "
@@ -32,30 +36,67 @@ PROMPT_USER_TEMPLATE = (
 )
 
 
-def generate_answer(question: str, chunks: List[str]) -> str:
+def _build_context(chunks: List[str]) -> str:
     """
-    Generate an answer given a user question and a list of retrieved text chunks (strings).
+    Join retrieved chunks into one context string, skipping exact duplicates and
+    truncating once MAX_CONTEXT_CHARS characters of chunk text have been used.
+    """
+    kept = []
+    seen = set()
+    used = 0
+    for c in chunks:
+        c = c.strip()
+        if not c or c in seen:
+            continue
+        seen.add(c)
+        if used + len(c) > MAX_CONTEXT_CHARS:
+            c = c[:MAX_CONTEXT_CHARS - used]
+        kept.append(c)
+        used += len(c)
+        if used >= MAX_CONTEXT_CHARS:
+            break
+    return CONTEXT_SEPARATOR.join(kept)
+
+
+def _build_messages(question: str, chunks: List[str]) -> List[dict]:
+    """
+    Build the chat messages for a question and its retrieved text chunks (strings).
     """
     # Here chunks are already strings → no need to index
-    context = "\n\n---\n\n".join(chunks)
+    context = _build_context(chunks)
 
     user_prompt = PROMPT_USER_TEMPLATE.format(context=context, question=question)
 
-    messages = [
+    return [
         {"role": "system", "content": PROMPT_SYSTEM},
         {"role": "user", "content": user_prompt},
     ]
 
-    resp = client.chat.completions.create(
+
+def _completion_kwargs(question: str, chunks: List[str]) -> dict:
+    """Arguments for chat.completions.create, shared by the sync and async clients."""
+    return dict(
         model=LLM_MODEL,
-        messages=messages,
+        messages=_build_messages(question, chunks),
         temperature=TEMPERATURE,
         max_tokens=512,
         n=1,
         top_p=1.0,
     )
 
+
+def generate_answer(question: str, chunks: List[str]) -> str:
+    """
+    Generate an answer given a user question and a list of retrieved text chunks (strings).
+    """
+    resp = client.chat.completions.create(**_completion_kwargs(question, chunks))
     return resp.choices[0].message.content.strip()
 
 
-    
+async def generate_answer_async(question: str, chunks: List[str]) -> str:
+    """
+    Async variant of generate_answer for request handlers: awaits the OpenAI call
+    instead of blocking a worker thread, so many requests can be in flight at once.
+    """
+    resp = await aclient.chat.completions.create(**_completion_kwargs(question, chunks))
+    return resp.choices[0].message.content.strip()
@@ -1,7 +1,13 @@
+import os
+
+import torch
 from fastapi import FastAPI
+from sqlalchemy import text
 from app.routes.chat import router as chat_router
+from app.embeddings import warmup as warmup_embeddings
+from app.search_db import engine
 from fastapi.middleware.cors import CORSMiddleware
-from app.utils import query_response_cache
+from app.utils import query_response_cache, semantic_query_cache, search_results_cache, semantic_search_cache
 
 app = FastAPI(title="AI Chat Engine - Dev")
 
@@ -19,6 +25,27 @@ app.include_router(chat_router)
 
 # Clear in-memory dev cache on startup so code changes show immediately
 query_response_cache.clear()
+semantic_query_cache.clear()
+search_results_cache.clear()
+semantic_search_cache.clear()
+
+@app.on_event("startup")
+def warmup():
+    """
+    Load the embedding model and open a DB connection before serving, so the first
+    /chat request does not pay multi-second model-load and connect latency.
+    """
+    # Optional explicit torch thread count (torch defaults to the number of physical cores).
+    num_threads = os.getenv("TORCH_NUM_THREADS")
+    if num_threads:
+        torch.set_num_threads(int(num_threads))
+
+    warmup_embeddings()
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        print(f"[main] Database warmup failed (will retry on first request): {e}")
 
 @app.get("/")
 def read_root():
@@ -1,12 +1,16 @@
 # app/routes/chat.py
 
-from fastapi import APIRouter, HTTPException
+import asyncio
+
+import orjson
+from fastapi import APIRouter, HTTPException, Response
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 
 from app.search_db import search_db as search
-from app.llm_manager import generate_answer
-from app.utils import make_cache_key, query_response_cache, compute_confidence_from_scores
+from app.embeddings import embed_query
+from app.llm_manager import generate_answer_async
+from app.utils import make_cache_key, query_response_cache, semantic_query_cache, compute_confidence_from_scores
 from app.filters import redact_text, is_disallowed
 
 router = APIRouter(prefix="/chat", tags=["chat"])
@@ -48,24 +52,51 @@ class ChatResponse(BaseModel):
 CONFIDENCE_THRESHOLD = 0.35
 
 
+def _format_sources(results: List[Tuple[Dict[str, Any], float]]) -> List[str]:
+    """Human-readable source labels; only called for the results actually returned."""
+    return [
+        f"{c['doc']} | {c['sheet']} | row:{c['row']} | chunk:{c['chunk_id']}"
+        for c, _ in results
+    ]
+
+
+def _serialize_for_cache(resp: ChatResponse) -> bytes:
+    """
+    Serialize a response once, at store time, already flagged cached=True.
+    Cache hits return these bytes as-is instead of rebuilding a ChatResponse.
+    """
+    payload = resp.dict()
+    payload["cached"] = True
+    return orjson.dumps(payload)
+
+
 # -------------------------------
 # Chat Endpoint
 # -------------------------------
 @router.post("/", response_model=ChatResponse)
-def chat_endpoint(req: ChatRequest):
+async def chat_endpoint(req: ChatRequest):
     if not req.question.strip():
         raise HTTPException(status_code=400, detail="question is empty")
 
-    # 1) Check Cache
-    cache_key = make_cache_key(req.user_id, req.question)
-    cached = query_response_cache.get(cache_key)
+    # 1) Check Cache (exact key first, then a semantically similar earlier question)
+    cache_key = make_cache_key(f"{req.user_id}:{req.top_k}", req.question)
+    # Paraphrase matches must come from the same user and the same top_k as the exact tier
+    semantic_scope = (req.user_id, req.top_k)
+    # Punctuation-only questions normalize to no key and skip both cache tiers
+    cached = query_response_cache.get(cache_key) if cache_key else None
+    q_vec = None
+    if not cached and cache_key:
+        # Encoding and DB search are blocking; run them off the event loop.
+        q_vec = await asyncio.to_thread(embed_query, req.question)
+        similar_key = semantic_query_cache.lookup(q_vec, scope=semantic_scope)
+        if similar_key is not None:
+            cached = query_response_cache.get(similar_key)
     if cached:
-        resp = ChatResponse(**cached)
-        resp.cached = True
-        return resp
+        # Already validated when it was stored; skip response_model validation on the hot path.
+        return Response(content=cached, media_type="application/json", headers={"X-Cache": "HIT"})
 
     # 2) Retrieve Top Chunks
-    results = search(req.question, top_k=req.top_k)
+    results = await asyncio.to_thread(search, req.question, top_k=req.top_k)
     if not results:
         return ChatResponse(
             answer="I don't have enough information on that yet.",
@@ -75,27 +106,27 @@ def chat_endpoint(req: ChatRequest):
             followups=[]
         )
 
-    texts = [r[0]["text"] for r in results]
-    scores = [r[1] for r in results]
-    sources = [
-        f"{r[0]['doc']} | {r[0]['sheet']} | row:{r[0]['row']} | chunk:{r[0]['chunk_id']}"
-        for r in results
-    ]
-
-    # 3) Confidence
-    confidence = compute_confidence_from_scores(scores)
-
-    # 4) Derive followups from chunks
+    # 3) Collect texts, scores and followups in a single pass over the results
+    #    (source labels are formatted later, only for the slice that is returned)
+    texts = []
+    scores = []
     relevant_followups = []
     for chunk, score in results:
-        if "followups" in chunk and chunk["followups"]:
-            # Normalize: ensure always list of strings
-            if isinstance(chunk["followups"], list):
-                for f in chunk["followups"]:
+        texts.append(chunk["text"])
+        scores.append(score)
+
+        # Derive followups from chunks. Normalize: ensure always list of strings
+        followups = chunk.get("followups")
+        if followups:
+            if isinstance(followups, list):
+                for f in followups:
                     if isinstance(f, str):
                         relevant_followups.append({"text": f, "score": score})
-            elif isinstance(chunk["followups"], str):
-                relevant_followups.append({"text": chunk["followups"].strip(), "score": score})
+            elif isinstance(followups, str):
+                relevant_followups.append({"text": followups.strip(), "score": score})
+
+    # 4) Confidence
+    confidence = compute_confidence_from_scores(scores)
 
     # Sort follow-ups by similarity score descending
     relevant_followups.sort(key=lambda x: x["score"], reverse=True)
@@ -111,16 +142,18 @@ def chat_endpoint(req: ChatRequest):
         resp = ChatResponse(
             answer=None,
             confidence=confidence,
-            sources=sources[:1],
+            sources=_format_sources(results[:1]),
             follow_up=follow_up,
             followups=relevant_followups[:3],
             redacted=False
         )
-        query_response_cache.set(cache_key, resp.dict())
+        if cache_key:
+            query_response_cache.set(cache_key, _serialize_for_cache(resp))
+            semantic_query_cache.add(q_vec, cache_key, scope=semantic_scope)
         return resp
 
     # 6) Generate Answer from LLM
-    answer = generate_answer(req.question, texts)
+    answer = await generate_answer_async(req.question, texts)
 
     if is_disallowed(answer):
         return ChatResponse(
@@ -138,11 +171,13 @@ def chat_endpoint(req: ChatRequest):
     resp = ChatResponse(
         answer=redacted_answer or None,
         confidence=float(confidence),
-        sources=sources[:5],
+        sources=_format_sources(results[:5]),
         follow_up=follow_up,
         followups=relevant_followups[:3],
         redacted=bool(had_redaction)
     )
 
-    query_response_cache.set(cache_key, resp.dict())
+    if cache_key:
+        query_response_cache.set(cache_key, _serialize_for_cache(resp))
+        semantic_query_cache.add(q_vec, cache_key, scope=semantic_scope)
     return resp
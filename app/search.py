@@ -2,21 +2,102 @@
 search.py
 
 Implements semantic search using cosine similarity between query embeddings
-and stored document embeddings.
+and stored document embeddings. Stored embeddings are L2-normalized at save time,
+so cosine similarity reduces to one matrix-vector product over the whole corpus.
+
+When faiss is installed, queries go through an HNSW index (inner product) that is
+built once, cached next to the vectors on disk, and reused across calls.
 """
 
+import os
 import numpy as np
 from typing import List, Tuple
-from app.embeddings import get_embedding_model, chunk_document, embed_chunks, load_embeddings
+from app.embeddings import embed_query, chunk_document, embed_chunks, load_embeddings, DEFAULT_OUTPUT_DIR
+
+try:
+    import faiss
+except ImportError:  # optional dependency: fall back to the brute-force NumPy scan
+    faiss = None
+
+# HNSW parameters (graph degree, build-time and query-time beam width)
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+INDEX_FILENAME = "index.faiss"
+
+# (vectors_mtime, chunks, embeddings, index) for the currently loaded corpus
+_corpus = None
 
 def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     """
-    Compute cosine similarity between two vectors.
+    Compute cosine similarity between two unit-norm vectors (all stored and query
+    embeddings are normalized at encode time, so this is just the dot product).
+    """
+    return float(np.dot(a, b))
+
+
+# Rows upcast from float16 to float32 per step when scoring (keeps the temporary copy small).
+SCORE_BLOCK_ROWS = 8192
+
+
+def score_embeddings(embeddings: np.ndarray, query_vector: np.ndarray) -> np.ndarray:
+    """
+    Cosine similarity between one unit-norm query and every (unit-norm) stored embedding.
+    Upcasts in blocks so each block is a single float32 BLAS matrix-vector product.
+    """
+    scores = np.empty(len(embeddings), dtype=np.float32)
+    for start in range(0, len(embeddings), SCORE_BLOCK_ROWS):
+        block = np.asarray(embeddings[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+        scores[start:start + len(block)] = block @ query_vector
+    return scores
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first. O(N) selection plus a sort of only k items.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(scores, -k)[-k:]
+    return idx[np.argsort(-scores[idx])]
+
+
+def _build_or_load_index(embeddings: np.ndarray, output_dir: str):
+    """
+    Return an HNSW index over the embeddings, reusing the on-disk copy if it is up to date.
+    """
+    index_path = os.path.join(output_dir, INDEX_FILENAME)
+    vectors_path = os.path.join(output_dir, "vectors.npy")
+
+    index = None
+    if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(vectors_path):
+        index = faiss.read_index(index_path)
+        if index.ntotal != len(embeddings):
+            index = None
+
+    if index is None:
+        print(f"[search] Building HNSW index over {len(embeddings)} vectors...")
+        index = faiss.IndexHNSWFlat(embeddings.shape[1], HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.add(np.ascontiguousarray(embeddings, dtype=np.float32))
+        faiss.write_index(index, index_path)
+
+    index.hnsw.efSearch = HNSW_EF_SEARCH
+    return index
+
+
+def _load_corpus(output_dir: str = DEFAULT_OUTPUT_DIR):
+    """
+    Load (or return cached) chunks, embeddings and ANN index. Reloads when vectors.npy changes.
     """
-    dot = np.dot(a, b)
-    norm_a = np.linalg.norm(a)
-    norm_b = np.linalg.norm(b)
-    return dot / (norm_a * norm_b + 1e-10)  # small term prevents divide-by-zero
+    global _corpus
+    mtime = os.path.getmtime(os.path.join(output_dir, "vectors.npy"))
+    if _corpus is None or _corpus[0] != mtime:
+        chunks, embeddings = load_embeddings(output_dir)
+        index = _build_or_load_index(embeddings, output_dir) if faiss is not None else None
+        _corpus = (mtime, chunks, embeddings, index)
+    return _corpus[1:]
 
 
 def search(query: str, top_k: int = 3) -> List[Tuple[str, float]]:
@@ -30,22 +111,21 @@ def search(query: str, top_k: int = 3) -> List[Tuple[str, float]]:
     Returns:
         List of tuples: (chunk_text, similarity_score)
     """
-    # Load previously saved chunks + embeddings
-    chunks, embeddings = load_embeddings()
+    # Load previously saved chunks + embeddings (cached across calls)
+    chunks, embeddings, index = _load_corpus()
 
-    # Convert query into embedding
-    model = get_embedding_model()
-    query_vector = model.encode([query])[0]  # single vector
+    # Convert query into a unit-norm embedding
+    query_vector = embed_query(query)
 
-    # Compute similarity with each chunk vector
-    scores = [cosine_similarity(query_vector, emb) for emb in embeddings]
+    if index is not None:
+        scores, ids = index.search(query_vector.reshape(1, -1), top_k)
+        return [(chunks[i]["text"], float(score)) for i, score in zip(ids[0], scores[0]) if i >= 0]
 
-    # Sort by similarity descending
-    ranked = sorted(zip(chunks, scores), key=lambda x: x[1], reverse=True)
+    # No ANN index: similarity with every chunk vector in one pass
+    scores = score_embeddings(embeddings, query_vector)
 
-    # Take top_k
-    top_results = [(item["text"], score) for item, score in ranked[:top_k]]
-    return top_results
+    # Take top_k without sorting the full score array
+    return [(chunks[i]["text"], float(scores[i])) for i in top_k_indices(scores, top_k)]
 
 
 if __name__ == "__main__":
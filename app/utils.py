@@ -1,44 +1,128 @@
 # app/utils.py
 """
-Small utilities: in-memory LRU cache (simple) and a helper to compute confidence.
-This cache is process-local and intended for dev. Replace with Redis/DB for production.
+Small utilities: in-memory LRU cache (simple), a semantic (embedding-similarity) cache,
+and a helper to compute confidence.
+These caches are process-local and intended for dev. Replace with Redis/DB for production.
 """
 
+import re
+import unicodedata
 from collections import OrderedDict
-from typing import Any, Tuple
+from threading import Lock
+from typing import Any, Optional
 
-# Simple LRU cache class (fixed capacity)
+import numpy as np
+
+# Simple LRU cache class (fixed capacity).
+# Safe to share between threads: chat and search caches are hit from asyncio.to_thread workers,
+# and concurrent move_to_end/popitem calls could otherwise corrupt the recency order.
 class SimpleLRUCache:
     def __init__(self, capacity: int = 1024):
         self.capacity = capacity
         self._store = OrderedDict()
+        self._lock = Lock()
 
     def get(self, key: str):
-        if key not in self._store:
-            return None
-        # move to end = most recently used
-        self._store.move_to_end(key)
-        return self._store[key]
+        with self._lock:
+            try:
+                # move to end = most recently used (raises KeyError on a miss, so no separate `in` check)
+                self._store.move_to_end(key)
+            except KeyError:
+                return None
+            return self._store[key]
 
     def set(self, key: str, value: Any):
-        if key in self._store:
+        with self._lock:
+            self._store[key] = value
             self._store.move_to_end(key)
-        self._store[key] = value
-        if len(self._store) > self.capacity:
-            # pop least recently used
-            self._store.popitem(last=False)
+            if len(self._store) > self.capacity:
+                # pop least recently used
+                self._store.popitem(last=False)
 
     def clear(self):
-        self._store.clear()
+        with self._lock:
+            self._store.clear()
+
+# Nearest-neighbour cache over unit-norm query embeddings (paraphrase matching)
+class SemanticCache:
+    """
+    Maps query embeddings to values; lookup() returns the value of the most similar stored
+    query if its cosine similarity is >= threshold. Entries live in a fixed-size ring buffer
+    (oldest overwritten first), so a lookup is one matrix-vector product over all entries.
+    Each entry has an optional scope (e.g. (user_id, top_k)); lookup only considers entries
+    stored under the same scope.
+    Safe to share between threads (search_db runs in worker threads).
+    """
+
+    def __init__(self, capacity: int = 500, threshold: float = 0.95):
+        self.capacity = capacity
+        self.threshold = threshold
+        self._vectors = None  # allocated on first add, once the embedding dim is known
+        self._values = [None] * capacity
+        self._scopes = [None] * capacity
+        self._scope_hashes = np.zeros(capacity, dtype=np.int64)
+        self._size = 0
+        self._next = 0
+        self._lock = Lock()
 
-# Single cache instance you can import
+    def lookup(self, vec: np.ndarray, scope: Any = None) -> Optional[Any]:
+        with self._lock:
+            if self._size == 0:
+                return None
+            sims = self._vectors[:self._size] @ vec
+            # Filter by scope before the argmax, so a closer entry from another scope cannot
+            # hide a valid match; the hash mask is vectorized, the equality check guards collisions.
+            sims[self._scope_hashes[:self._size] != hash(scope)] = -np.inf
+            best = int(np.argmax(sims))
+            if sims[best] >= self.threshold and self._scopes[best] == scope:
+                return self._values[best]
+            return None
+
+    def add(self, vec: np.ndarray, value: Any, scope: Any = None):
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.capacity, len(vec)), dtype=np.float32)
+            self._vectors[self._next] = vec
+            self._values[self._next] = value
+            self._scopes[self._next] = scope
+            self._scope_hashes[self._next] = hash(scope)
+            self._next = (self._next + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def clear(self):
+        with self._lock:
+            self._values = [None] * self.capacity
+            self._scopes = [None] * self.capacity
+            self._size = 0
+            self._next = 0
+
+# Single cache instances you can import
 query_response_cache = SimpleLRUCache(capacity=500)
+# Maps question embeddings to query_response_cache keys, so paraphrases reuse cached answers
+# (scoped by (user_id, top_k), like the exact keys)
+semantic_query_cache = SemanticCache(capacity=500, threshold=0.95)
+# search_db results: exact (normalized question) tier, then near-duplicate question tier
+# (which maps embeddings to search_results_cache keys, scoped by top_k)
+search_results_cache = SimpleLRUCache(capacity=500)
+semantic_search_cache = SemanticCache(capacity=500, threshold=0.97)
+
+# Sentence-level punctuation and quotes at the start/end of a token ("x?" -> "x"); symbols
+# inside or as part of a token ("C++", "C#", "$100", "3.5", "don't") are kept.
+_EDGE_PUNCT_RE = re.compile(r"""(?<!\S)[?!.,;:"'“”‘’]+|[?!.,;:"'“”‘’]+(?!\S)""")
+_WS_RE = re.compile(r"\s+")
 
-def make_cache_key(user_id: str, question: str) -> str:
+def make_cache_key(user_id: str, question: str) -> Optional[str]:
     """
-    Normalize a question into a cache key. Keep it simple for now.
+    Normalize a question into a cache key: NFKC, lowercase, sentence punctuation dropped,
+    whitespace collapsed, so "What is X?" and "what   is x" share one entry.
+    Returns None if nothing is left (e.g. "?" or "..."); such questions should not be cached.
     """
-    return f"{user_id}::{question.strip().lower()}"
+    q = unicodedata.normalize("NFKC", question).lower()
+    q = _EDGE_PUNCT_RE.sub(" ", q)
+    q = _WS_RE.sub(" ", q).strip()
+    if not q:
+        return None
+    return f"{user_id}::{q}"
 
 def compute_confidence_from_scores(similarity_scores):
     """
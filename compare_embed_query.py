@@ -1,6 +1,6 @@
 # compare_embed_query.py
 import numpy as np
-from app.embeddings import get_embedding_model
+from app.embeddings import embed_cached, enable_disk_cache
 import json
 import os
 
@@ -15,19 +15,14 @@ with open(chunks_path, "r", encoding="utf-8") as f:
 chunk_text = chunks[0]["text"]
 query = "What is this about?"
 
-model = get_embedding_model()
-# compute both embeddings in the same session
-chunk_vec = model.encode([chunk_text])[0]
-query_vec = model.encode([query])[0]
-
-# compute cosine (dot product if normalized)
-def cosine(a, b):
-    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-12))
+# embed both texts; with the disk cache enabled, re-runs reuse the vectors instead of re-encoding
+enable_disk_cache()
+chunk_vec = embed_cached(chunk_text)
+query_vec = embed_cached(query)
 
 print("Chunk text (preview):", chunk_text)
 print("Query:", query)
 print("chunk_vec[:8]:", chunk_vec[:8])
 print("query_vec[:8]:", query_vec[:8])
-print("||chunk||:", np.linalg.norm(chunk_vec))
-print("||query||:", np.linalg.norm(query_vec))
-print("Cosine similarity:", cosine(query_vec, chunk_vec))
+# embed_cached returns unit-norm vectors, so the cosine is the plain dot product
+print("Cosine similarity:", float(np.dot(query_vec, chunk_vec)))
@@ -1,35 +1,58 @@
 import numpy as np
-from app.embeddings import load_embeddings, get_embedding_model
-import json
+from app.embeddings import load_embeddings, load_int8_embeddings, quantize_int8, embed_cached, enable_disk_cache
+from app.search import top_k_indices
 
-def cosine(a, b):
-    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-10))
+try:
+    import simsimd
+except ImportError:  # optional: fall back to a float32 NumPy matrix-vector product
+    simsimd = None
+
+def score_all(qv, embeddings):
+    """
+    Cosine of qv against every stored row (stored rows are unit-norm).
+    With SimSIMD, scans the int8-quantized copy using its native int8 kernels. Without it,
+    uses one float32 BLAS sgemv: NumPy has no fast int8 matmul, and upcasting the int8 matrix
+    would move as many bytes as float32 anyway.
+    """
+    if simsimd is not None:
+        vectors_i8, _ = load_int8_embeddings()
+        q_i8, _ = quantize_int8(qv)
+        E = np.ascontiguousarray(vectors_i8)
+        return 1.0 - np.asarray(simsimd.cdist(q_i8, E, metric="cosine"), dtype=np.float32)[0]
+    E = np.ascontiguousarray(embeddings, dtype=np.float32)
+    return E @ np.asarray(qv, dtype=np.float32)
 
 def main():
+    enable_disk_cache()  # re-running with the same query skips the model
     query = input("Enter the exact query you used: ").strip()
     print("Loading chunks + vectors...")
     chunks, embeddings = load_embeddings()
     print("Chunks:", len(chunks), "Embeddings shape:", embeddings.shape)
+    if len(embeddings) == 0:
+        # top_k_indices would return nothing and argmin raises on an empty array
+        print("No embeddings saved yet; nothing to compare against.")
+        return
 
-    model = get_embedding_model()
     print("Encoding query...")
-    qv = model.encode([query])[0]
+    qv = embed_cached(query)
     print("Query vector shape:", qv.shape)
 
-    # compute scores
-    scores = [cosine(qv, emb) for emb in embeddings]
-    ranked = sorted(list(enumerate(scores)), key=lambda x: x[1], reverse=True)
+    # compute scores: cosine against every row in one call
+    scores = score_all(qv, embeddings)
+    top_idx = top_k_indices(scores, 5)
 
     print("\nTop 5 matches (index, score):")
-    for idx, score in ranked[:5]:
+    for idx in top_idx:
         text = chunks[idx]["text"]
-        print(f"[{idx}] score={score:.4f}")
+        print(f"[{idx}] score={scores[idx]:.4f}")
         print("  Text (first 200 chars):", text[:200].replace("\n"," "))
         print()
 
     # Show diagnostics for best and worst
-    best_idx, best_score = ranked[0]
-    worst_idx, worst_score = ranked[-1]
+    best_idx = int(top_idx[0])
+    best_score = float(scores[best_idx])
+    worst_idx = int(scores.argmin())
+    worst_score = float(scores[worst_idx])
     print("Best index/norms:")
     print(" best_idx:", best_idx, "best_score:", best_score)
     print("  ||q||:", np.linalg.norm(qv), "||best_emb||:", np.linalg.norm(embeddings[best_idx]))
@@ -1,14 +1,28 @@
 # ingest_excel.py
+import hashlib
+import json
 import os
+import re
 import sys
-from typing import List, Dict
+import zipfile
+from typing import List, Dict, Optional, Tuple
+import numpy as np
 import pandas as pd
 
-from app.ingest_to_postgres import ingest_passages_to_db
+from app.embeddings import EMBEDDING_MODEL_NAME
+from app.ingest_to_postgres import chunk_passages, embed_passages, ingest_passages_to_db
 
 # Path to your Excel (adjust if needed)
 EXCEL_PATH = os.path.join("data", "Dialogflow_Chatbot_Training_Template_with_Video_Subservices.xlsx")
 
+# Extracted passages + their vectors from previous runs, keyed by workbook content hash
+INGEST_CACHE_DIR = os.path.join("data", ".ingest_cache")
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+# Bump whenever extract_passages_from_excel / split_followups_cell change what they produce,
+# so cached passages from the old extraction are not reused.
+EXTRACTION_VERSION = 1
+
 # common names to check for follow-up fields (case-insensitive)
 FOLLOWUP_COL_CANDIDATES = {
     "Follow-up Prompts",  # exact match from your Excel
@@ -26,95 +40,148 @@ def find_followup_column(columns):
             return cols_lower[candidate.lower()]
     return None
 
+# common follow-up separators: '||', newlines, ';'
+_FOLLOWUP_SEP_RE = re.compile(r"\|\||\r?\n|\r|;")
+
 def split_followups_cell(cell_value: str):
     """
     Normalize a cell's follow-up content into a list of strings.
-    Supports newline-separated, semicolon-separated, or '||' separators.
+    Supports newline-separated, semicolon-separated, or '||' separators (in one regex pass).
     """
     if not cell_value:
         return []
     # ensure string
-    s = str(cell_value).strip()
-    # common separators
-    parts = []
-    # try double-pipe first (used sometimes)
-    if "||" in s:
-        parts = [p.strip() for p in s.split("||") if p.strip()]
-    elif "\n" in s:
-        parts = [p.strip() for p in s.splitlines() if p.strip()]
-    elif ";" in s:
-        parts = [p.strip() for p in s.split(";") if p.strip()]
-    else:
-        parts = [s]
-    return parts
+    parts = (p.strip() for p in _FOLLOWUP_SEP_RE.split(str(cell_value)))
+    return [p for p in parts if p]
+
+def _stripped_column(df: pd.DataFrame, name: str) -> pd.Series:
+    # Column as stripped strings, or all-empty if this sheet does not have it
+    if name in df.columns:
+        return df[name].astype(str).str.strip()
+    return pd.Series("", index=df.index, dtype=object)
 
 def extract_passages_from_excel(path: str) -> List[Dict]:
     if not os.path.exists(path):
         print(f"Excel file not found at {path}")
         sys.exit(1)
 
-    xls = pd.ExcelFile(path)
+    # pandas' openpyxl reader opens the workbook read_only/data_only (streamed rows, cached values)
+    xls = pd.ExcelFile(path, engine="openpyxl")
     all_passages = []
     doc_name = os.path.basename(path)
 
+    # Key columns from your template
+    response_col = "Response (Short, Natural)"
+    intent_col = "Intent Name"
+    training_col = "Training Phrases (Examples)"
+    followup_col = "Follow-up Prompts"
+    category_col = "Service Category"
+    origin_cols = ", ".join([response_col, intent_col, category_col, training_col, followup_col])
+    used_cols = {response_col, intent_col, category_col, training_col, followup_col}
+
     for sheet in xls.sheet_names:
-        df = xls.parse(sheet_name=sheet, dtype=str).fillna("")
-        
-        # Key columns from your template
-        response_col = "Response (Short, Natural)"
-        intent_col = "Intent Name"
-        training_col = "Training Phrases (Examples)"
-        followup_col = "Follow-up Prompts"
-        category_col = "Service Category"
-        
-        for idx, row in df.iterrows():
-            # Primary response text (most important)
-            response_text = str(row.get(response_col, "")).strip()
-            if not response_text:
-                continue  # Skip if no response text
-                
-            # Build rich context
-            context_parts = []
-            
-            # Add intent and category if available
-            intent = str(row.get(intent_col, "")).strip()
-            category = str(row.get(category_col, "")).strip()
-            if intent:
-                context_parts.append(f"Intent: {intent}")
-            if category:
-                context_parts.append(f"Category: {category}")
-                
-            # Add training phrases if available
-            training = str(row.get(training_col, "")).strip()
-            if training:
-                phrases = split_followups_cell(training)  # reuse splitter for pipe-separated phrases
-                if phrases:
-                    context_parts.append(f"Example Questions: {', '.join(phrases)}")
-            
-            # Combine context with response
-            text = f"{' | '.join(context_parts)}\n\nResponse: {response_text}"
-            
-            # Extract followups
-            followups = []
-            if followup_col in df.columns:
-                raw = str(row[followup_col]).strip()
-                if raw:
-                    followups = split_followups_cell(raw)
-                    
+        # Only materialize the columns we use; a callable (unlike a list) tolerates sheets
+        # that lack some of them.
+        df = xls.parse(sheet_name=sheet, usecols=lambda c: c in used_cols, dtype=str).fillna("")
+
+        # Primary response text (most important); skip rows without it
+        response = _stripped_column(df, response_col)
+        mask = response != ""
+        if not mask.any():
+            continue
+        df = df.loc[mask]
+        response = response[mask]
+
+        # Build rich context column-wise: intent, category, training phrases
+        intent = _stripped_column(df, intent_col)
+        category = _stripped_column(df, category_col)
+        intent_part = ("Intent: " + intent).where(intent != "", "")
+        category_part = ("Category: " + category).where(category != "", "")
+        # reuse splitter for pipe-separated phrases
+        phrases = _stripped_column(df, training_col).map(split_followups_cell)
+        training_part = phrases.map(lambda ph: f"Example Questions: {', '.join(ph)}" if ph else "")
+
+        # Extract followups
+        if followup_col in df.columns:
+            followups = _stripped_column(df, followup_col).map(split_followups_cell)
+        else:
+            followups = pd.Series([[] for _ in range(len(df))], index=df.index, dtype=object)
+
+        # Combine context with response
+        for idx, resp, ip, cp, tp, fu in zip(df.index, response, intent_part, category_part, training_part, followups):
+            context = " | ".join(part for part in (ip, cp, tp) if part)
             all_passages.append({
                 "doc": doc_name,
                 "sheet": sheet,
                 "row": int(idx),
-                "col": ", ".join([response_col, intent_col, category_col, training_col, followup_col]),
-                "text": text,
-                "followups": followups
+                "col": origin_cols,
+                "text": f"{context}\n\nResponse: {resp}",
+                "followups": fu
             })
     return all_passages
 
+def _ingest_cache_path(path: str) -> str:
+    """
+    Cache file for this workbook. The key covers the file bytes, the model, the chunking
+    parameters and EXTRACTION_VERSION; other code changes need a version bump (or clearing
+    INGEST_CACHE_DIR) to take effect.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    h.update(f"{EMBEDDING_MODEL_NAME}:{CHUNK_SIZE}:{CHUNK_OVERLAP}:{EXTRACTION_VERSION}".encode())
+    return os.path.join(INGEST_CACHE_DIR, f"{h.hexdigest()}.npz")
+
+def _load_ingest_cache(cache_path: str) -> Optional[Tuple[List[Dict], np.ndarray]]:
+    if not os.path.exists(cache_path):
+        return None
+    # passages are stored as UTF-8 JSON bytes, so no pickle is needed to read them back
+    try:
+        with np.load(cache_path) as data:
+            passages = json.loads(data["passages"].tobytes().decode("utf-8"))
+            vectors = data["vectors"]
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile) as e:
+        # unreadable/partial file: treat as a miss, it is overwritten after re-encoding
+        print(f"[ingest_excel] ignoring unreadable ingest cache {cache_path}: {e}")
+        return None
+    return passages, vectors
+
+def _save_ingest_cache(cache_path: str, passages: List[Dict], vectors: np.ndarray):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    passages_json = np.frombuffer(json.dumps(passages, ensure_ascii=False).encode("utf-8"), dtype=np.uint8)
+    # Write to a temp file and rename it into place, so an interrupted run never leaves a
+    # truncated .npz at the final path
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.savez(f, passages=passages_json, vectors=vectors)
+        os.replace(tmp_path, cache_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
 def main():
-    passages = extract_passages_from_excel(EXCEL_PATH)
-    print(f"[ingest_excel] extracted {len(passages)} passages")
-    ingest_passages_to_db(passages, chunk_size=500, chunk_overlap=50)
+    if not os.path.exists(EXCEL_PATH):
+        print(f"Excel file not found at {EXCEL_PATH}")
+        sys.exit(1)
+
+    cache_path = _ingest_cache_path(EXCEL_PATH)
+    cached = _load_ingest_cache(cache_path)
+    if cached is not None:
+        passages, vectors = cached
+        print(f"[ingest_excel] workbook unchanged, loaded {len(passages)} passages / {len(vectors)} chunks from {cache_path}")
+        chunks = chunk_passages(passages, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    else:
+        passages = extract_passages_from_excel(EXCEL_PATH)
+        print(f"[ingest_excel] extracted {len(passages)} passages")
+        # Split once; the same list feeds the encoder and the COPY writer, so rows and vectors line up
+        chunks = chunk_passages(passages, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        # Encode all subchunks in one batched call, then bulk-load them with the vectors
+        vectors = embed_passages(chunks)
+        print(f"[ingest_excel] encoded {len(vectors)} chunks")
+        _save_ingest_cache(cache_path, passages, vectors)
+    ingest_passages_to_db(passages, vectors=vectors, chunks=chunks)
 
 if __name__ == "__main__":
     main()